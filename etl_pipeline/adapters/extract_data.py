@@ -2,25 +2,199 @@
 
 import pandas as pd
 import logging
-from typing import Tuple
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
+MESSAGE_TIMESTAMP_COLUMNS = [
+    "inserted_at",
+    "updated_at",
+    "external_timestamp",
+    "last_status_timestamp",
+]
+STATUS_TIMESTAMP_COLUMNS = ["timestamp", "inserted_at", "updated_at"]
+MESSAGE_INTEGER_COLUMNS = ["id"]
+STATUS_INTEGER_COLUMNS = ["id", "message_id", "number_id"]
+
+# Stored with the sheet's ETag in the cache's .version file. The cache holds
+# parsed frames, so bump this whenever the read_csv dtypes or the coercion
+# helpers change, or cached sheets keep their old parsing.
+CACHE_FORMAT_VERSION = 2
+
+# Candidate formats tried against the first non-null value of a column
+_TIMESTAMP_FORMATS = [
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S.%f",
+]
+
+
+def _sniff_timestamp_format(values: pd.Series) -> Optional[str]:
+    """Return the strptime format matching the first non-null value, if any"""
+    sample = values.dropna()
+    if sample.empty:
+        return None
+    first = str(sample.iloc[0]).strip()
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            datetime.strptime(first, fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+
+def _coerce_timestamps(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """Parse timestamp columns once per column with an explicit format"""
+    for col in cols:
+        if col not in df.columns or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+
+        values = df[col]
+        fmt = _sniff_timestamp_format(values) or "ISO8601"
+        parsed = pd.to_datetime(
+            values, format=fmt, errors="coerce", cache=True, utc=True
+        )
+
+        # Rows not matching the sniffed format get one vectorized ISO8601 retry
+        missed = parsed.isna() & values.notna()
+        if fmt != "ISO8601" and missed.any():
+            parsed[missed] = pd.to_datetime(
+                values[missed], format="ISO8601", errors="coerce", utc=True
+            )
+        df[col] = parsed
+    return df
+
+
+def _coerce_integers(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """Parse integer columns, turning cells that are not integers into nulls"""
+    for col in cols:
+        if col not in df.columns:
+            continue
+        parsed = pd.to_numeric(df[col], errors="coerce", dtype_backend="pyarrow")
+        if not pd.api.types.is_integer_dtype(parsed):
+            # Exports may write ids as "12.0"; fractional values are not ids
+            parsed = parsed.where(parsed == parsed.round()).astype("int64[pyarrow]")
+        df[col] = parsed
+    return df
+
 
 class GSheetsExtractor:
     """Simple Google Sheets extractor using pandas"""
 
-    def __init__(self, data_dir: str = None):
+    # Explicit read_csv dtypes matching RawMessage/RawStatus, so the parser skips
+    # type inference. Timestamps and integers are read as text and parsed by
+    # _coerce_timestamps and _coerce_integers, so one bad cell cannot fail the tab.
+    _MESSAGES_DTYPES = {
+        "id": "string[pyarrow]",
+        "message_type": "string[pyarrow]",
+        "masked_addressees": "string[pyarrow]",
+        "masked_author": "string[pyarrow]",
+        "content": "string[pyarrow]",
+        "author_type": "string[pyarrow]",
+        "direction": "string[pyarrow]",
+        "external_id": "string[pyarrow]",
+        "external_timestamp": "string[pyarrow]",
+        "masked_from_addr": "string[pyarrow]",
+        "is_deleted": "string[pyarrow]",
+        "last_status": "string[pyarrow]",
+        "last_status_timestamp": "string[pyarrow]",
+        "rendered_content": "string[pyarrow]",
+        "source_type": "string[pyarrow]",
+        "uuid": "string[pyarrow]",
+        "inserted_at": "string[pyarrow]",
+        "updated_at": "string[pyarrow]",
+    }
+    _STATUSES_DTYPES = {
+        "id": "string[pyarrow]",
+        "status": "string[pyarrow]",
+        "timestamp": "string[pyarrow]",
+        "uuid": "string[pyarrow]",
+        "message_uuid": "string[pyarrow]",
+        "message_id": "string[pyarrow]",
+        "number_id": "string[pyarrow]",
+        "inserted_at": "string[pyarrow]",
+        "updated_at": "string[pyarrow]",
+    }
+
+    def __init__(self, data_dir: str = None, cache_dir: str = None):
         # Google Sheets export URLs for different tabs
         base_url = "https://docs.google.com/spreadsheets/d/1XC0YaSQ4WjLwhzCB96RxF23-NjFga1Fisr-9lX_7hmk/export?format=csv"
         self.messages_url = f"{base_url}&gid=1033608769"  # Messages tab
         self.statuses_url = f"{base_url}&gid=966707183"  # Statuses tab
+        # Parsed sheets are cached as Parquet, keyed by the server's ETag and CACHE_FORMAT_VERSION
+        self.cache_dir = Path(cache_dir or os.getenv("SHEETS_CACHE_DIR", ".cache/sheets"))
+
+    def _remote_version(self, url: str) -> Optional[str]:
+        """Return the ETag (or Last-Modified) reported for url, if any"""
+        try:
+            request = urllib.request.Request(url, method="HEAD")
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.headers.get("ETag") or response.headers.get(
+                    "Last-Modified"
+                )
+        except Exception as e:
+            logger.debug(f"Could not check remote version of {url}: {e}")
+            return None
 
-    def _read_sheet_data(self, url: str, sheet_name: str) -> pd.DataFrame:
-        """Read data from specific Google Sheet tab"""
+    def _write_cache(
+        self, df: pd.DataFrame, cache_path: Path, version_path: Path, version: str
+    ) -> None:
+        """Persist a parsed sheet and the version it was downloaded at"""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to temporary files and rename them into place, so an interrupted
+            # write never leaves a partial frame next to a matching version
+            tmp_cache_path = cache_path.with_name(cache_path.name + ".tmp")
+            tmp_version_path = version_path.with_name(version_path.name + ".tmp")
+            df.to_parquet(tmp_cache_path, compression="zstd")
+            tmp_version_path.write_text(version, encoding="utf-8")
+            version_path.unlink(missing_ok=True)
+            os.replace(tmp_cache_path, cache_path)
+            os.replace(tmp_version_path, version_path)
+        except Exception as e:
+            logger.warning(f"Failed to cache sheet at {cache_path}: {e}")
+
+    def _read_sheet_data(
+        self,
+        url: str,
+        sheet_name: str,
+        timestamp_columns: Sequence[str] = (),
+        integer_columns: Sequence[str] = (),
+        dtypes: Optional[Dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        """Read data from specific Google Sheet tab, reusing the local cache when unchanged"""
         try:
             logger.info(f"Reading data from {sheet_name} tab")
-            df = pd.read_csv(url)
+            cache_path = self.cache_dir / f"{sheet_name.lower()}.parquet"
+            version_path = cache_path.with_suffix(".version")
+            version = self._remote_version(url)
+            if version:
+                version = f"{CACHE_FORMAT_VERSION}:{version}"
+
+            if (
+                version
+                and cache_path.exists()
+                and version_path.exists()
+                and version_path.read_text(encoding="utf-8") == version
+            ):
+                df = pd.read_parquet(cache_path)
+                logger.info(f"Loaded {len(df)} cached rows for {sheet_name}")
+                return df
+
+            # The C engine applies dtype while parsing; engine="pyarrow" infers
+            # first and casts afterwards, which mangles text like "0012" or "false"
+            df = pd.read_csv(url, dtype=dtypes, dtype_backend="pyarrow")
+            df = _coerce_timestamps(df, list(timestamp_columns))
+            df = _coerce_integers(df, list(integer_columns))
+            if version:
+                self._write_cache(df, cache_path, version_path, version)
             logger.info(f"Extracted {len(df)} rows from {sheet_name}")
             return df
         except Exception as e:
@@ -29,18 +203,31 @@ class GSheetsExtractor:
 
     def extract_messages(self) -> pd.DataFrame:
         """Extract messages data from Messages tab"""
-        df = self._read_sheet_data(self.messages_url, "Messages")
+        df = self._read_sheet_data(
+            self.messages_url,
+            "Messages",
+            MESSAGE_TIMESTAMP_COLUMNS,
+            MESSAGE_INTEGER_COLUMNS,
+            self._MESSAGES_DTYPES,
+        )
         logger.info(f"Extracting messages: {len(df)} rows")
         return df
 
     def extract_statuses(self) -> pd.DataFrame:
         """Extract statuses data from Statuses tab"""
-        df = self._read_sheet_data(self.statuses_url, "Statuses")
+        df = self._read_sheet_data(
+            self.statuses_url,
+            "Statuses",
+            STATUS_TIMESTAMP_COLUMNS,
+            STATUS_INTEGER_COLUMNS,
+            self._STATUSES_DTYPES,
+        )
         logger.info(f"Extracting statuses: {len(df)} rows")
         return df
 
     def extract_all(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
-        """Extract both datasets"""
-        messages_df = self.extract_messages()
-        statuses_df = self.extract_statuses()
-        return messages_df, statuses_df
\ No newline at end of file
+        """Extract both datasets, downloading the two tabs concurrently"""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            messages_future = executor.submit(self.extract_messages)
+            statuses_future = executor.submit(self.extract_statuses)
+            return messages_future.result(), statuses_future.result()
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
+import io
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 from pathlib import Path
 import logging
+from typing import Dict, List, Optional
 
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 from google.oauth2 import service_account
 from dotenv import load_dotenv
@@ -13,6 +18,37 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Raw tables are clustered on the key unified_messages joins them by
+RAW_CLUSTERING_FIELDS = {
+    "messages_raw": ["uuid"],
+    "statuses_raw": ["message_uuid"],
+}
+
+
+def _prepare_for_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """Give every column a concrete Arrow-friendly dtype before Parquet upload"""
+    # ArrowDtype columns already carry an Arrow type, and convert_dtypes cannot
+    # map some of them (e.g. timestamps) back to a pandas dtype
+    arrow_columns = [
+        col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.ArrowDtype)
+    ]
+    converted = df.drop(columns=arrow_columns).convert_dtypes()
+    df = pd.concat([converted, df[arrow_columns]], axis=1)[df.columns]
+    # Columns still typed object hold mixed values or only nulls; load them as STRING
+    object_columns = df.columns[df.dtypes == object]
+    if len(object_columns):
+        df[object_columns] = df[object_columns].astype("string")
+    return df
+
+
+def _df_to_parquet(df: pd.DataFrame) -> io.BytesIO:
+    """Convert a DataFrame to Arrow once and serialize it as snappy Parquet"""
+    table = pa.Table.from_pandas(_prepare_for_parquet(df), preserve_index=False)
+    buf = io.BytesIO()
+    pq.write_table(table, buf, compression="snappy")
+    buf.seek(0)
+    return buf
+
 
 class BigQueryLoader:
     """Simple BigQuery uploader"""
@@ -84,43 +120,90 @@ class BigQueryLoader:
                 f"Created dataset {self.dataset_id} in location {self.location}"
             )
 
+    def _load_job_config(self, if_exists: str) -> bigquery.LoadJobConfig:
+        """Build a load job config with the write disposition for if_exists"""
+        job_config = bigquery.LoadJobConfig()
+        if if_exists == "replace":
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+        elif if_exists == "append":
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+        return job_config
+
     def load_dataframe(
-        self, df: pd.DataFrame, table_name: str, if_exists: str = "replace"
-    ) -> None:
-        """Upload pandas DataFrame to BigQuery"""
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        if_exists: str = "replace",
+    ) -> Optional[bigquery.LoadJob]:
+        """Start a load job for a pandas DataFrame without waiting on it"""
         if not self.is_available():
             logger.warning(
                 f"BigQuery client not available. Skipping upload to {table_name}"
             )
-            return
+            return None
 
         logger.info(f"Uploading {len(df)} rows to {self.dataset_id}.{table_name}")
 
         table_ref = f"{self.project_id}.{self.dataset_id}.{table_name}"
 
-        job_config = bigquery.LoadJobConfig()
-        if if_exists == "replace":
-            job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
-        elif if_exists == "append":
-            job_config.write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+        job_config = self._load_job_config(if_exists)
+        # Parquet carries its own schema, so no autodetect pass is needed
+        job_config.source_format = bigquery.SourceFormat.PARQUET
 
-        job_config.autodetect = True
+        clustering_fields = RAW_CLUSTERING_FIELDS.get(table_name)
+        if clustering_fields:
+            job_config.clustering_fields = clustering_fields
+            if if_exists == "replace":
+                self._drop_if_clustering_differs(table_ref, clustering_fields)
 
-        job = self.client.load_table_from_dataframe(
-            df, table_ref, job_config=job_config
+        # The buffer is uploaded before load_table_from_file returns, so the
+        # Parquet payload is released as soon as the job is submitted
+        return self.client.load_table_from_file(
+            _df_to_parquet(df), table_ref, job_config=job_config
         )
-        job.result()  # Wait for completion
 
-        logger.info(f"Successfully uploaded data to {table_ref}")
-
-    def load_table(self, df: pd.DataFrame, table_name: str, if_exists: str = "replace") -> bool:
-        """Upload a single table to BigQuery"""
+    def _drop_if_clustering_differs(
+        self, table_ref: str, clustering_fields: List[str]
+    ) -> None:
+        """A truncating load cannot re-cluster an existing table, so drop it first"""
         try:
-            self.load_dataframe(df, table_name, if_exists)
-            return True
-        except Exception as e:
-            logger.error(f"Failed to upload {table_name}: {e}")
-            return False
+            table = self.client.get_table(table_ref)
+        except NotFound:
+            return
+        if table.clustering_fields != clustering_fields:
+            logger.info(f"Dropping {table_ref} to re-create it clustered by {clustering_fields}")
+            self.client.delete_table(table_ref, not_found_ok=True)
+
+    def load_tables_parallel(
+        self,
+        tables: Dict[str, pd.DataFrame],
+        if_exists: str = "replace",
+    ) -> int:
+        """Submit all load jobs up front, then wait on them; returns the success count
+
+        tables maps table names to DataFrames.
+        """
+        if not self.is_available():
+            logger.warning("BigQuery client not available. Skipping uploads")
+            return 0
+
+        jobs: Dict[str, bigquery.LoadJob] = {}
+        for table_name, df in tables.items():
+            try:
+                jobs[table_name] = self.load_dataframe(df, table_name, if_exists)
+            except Exception as e:
+                logger.error(f"Failed to upload {table_name}: {e}")
+
+        success_count = 0
+        for table_name, job in jobs.items():
+            try:
+                if job is not None:
+                    job.result()
+                    logger.info(f"Successfully uploaded data to {job.destination}")
+                success_count += 1
+            except Exception as e:
+                logger.error(f"Failed to upload {table_name}: {e}")
+        return success_count
 
     def ensure_dataset_exists(self) -> None:
         """Ensure the dataset exists, create if needed"""
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 
+import logging
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field, field_validator, ValidationError
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, get_args
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
 import pandas as pd
-import numpy as np
+import orjson
 
+logger = logging.getLogger(__name__)
 
 # Status constants (simplified from enums)
 STATUS_TYPES = ["sent", "delivered", "read", "failed", "deleted"]
@@ -13,6 +16,38 @@ MESSAGE_TYPES = ["text", "interactive", "button", "image", "document", "audio",
 AUTHOR_TYPES = ["OWNER", "USER", "STACK", "AUTOMATOR", "OPERATOR", "SYSTEM"]
 DIRECTIONS = ["inbound", "outbound"]
 
+# Categorical fields checked in bulk by UnifiedMessage.from_dataframe
+CATEGORICAL_FIELDS = {
+    "direction": DIRECTIONS,
+    "message_type": MESSAGE_TYPES,
+    "author_type": AUTHOR_TYPES,
+}
+
+
+def strip_string_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Strip whitespace in every text column once; empty strings become missing"""
+    text_columns = df.select_dtypes(include=["object", "string"]).columns
+    if len(text_columns) == 0:
+        return df
+
+    def _strip(values: pd.Series) -> pd.Series:
+        try:
+            stripped = values.str.strip()
+        except AttributeError:  # object column without any strings
+            return values
+        # Non-string cells in object columns come back as NaN; keep them as-is
+        stripped = stripped.where(stripped.notna(), values)
+        return stripped.mask(stripped == "")
+
+    df = df.copy()
+    df[text_columns] = df[text_columns].apply(_strip)
+    return df
+
+
+def prep_for_models(df: pd.DataFrame) -> pd.DataFrame:
+    """Replace every NaN/NaT/NA with None in one pass, ready for model construction"""
+    return df.astype(object).where(df.notna(), None)
+
 
 class RawMessage(BaseModel):
     """Raw message data model"""
@@ -25,35 +60,17 @@ class RawMessage(BaseModel):
     author_type: str
     direction: str
     external_id: Optional[str]
-    external_timestamp: Optional[str]
+    external_timestamp: Optional[datetime]
     masked_from_addr: Optional[str]
     is_deleted: Optional[str]
     last_status: Optional[str]
-    last_status_timestamp: Optional[str]
+    last_status_timestamp: Optional[datetime]
     rendered_content: Optional[str]
     source_type: Optional[str]
     uuid: str
-    inserted_at: str
-    updated_at: str
-
-    # Convert string timestamps to datetime objects
-    @field_validator(
-        "inserted_at", "updated_at", "external_timestamp", "last_status_timestamp"
-    )
-    @classmethod
-    def validate_datetime(cls, v):
-        if v and v != "":
-            try:
-                # Handle different datetime formats
-                if isinstance(v, str):
-                    return datetime.fromisoformat(v.replace(" ", "T"))
-                elif isinstance(v, datetime):
-                    return v
-                else:
-                    return str(v)  # Keep as string if can't parse
-            except:
-                return v
-        return v
+    # Timestamps are parsed column-wise at extraction (see extract_data._coerce_timestamps)
+    inserted_at: Optional[datetime]
+    updated_at: Optional[datetime]
 
 
 class RawStatus(BaseModel):
@@ -61,15 +78,13 @@ class RawStatus(BaseModel):
 
     id: int
     status: str
-    timestamp: str
+    timestamp: Optional[datetime]
     uuid: str
     message_uuid: Optional[str]
     message_id: Optional[int]
     number_id: Optional[int]
-    inserted_at: str
-    updated_at: str
-
-    # Convert string timestamps to datetime objects (uses the more comprehensive validator above)
+    inserted_at: Optional[datetime]
+    updated_at: Optional[datetime]
 
 
 class UnifiedMessage(BaseModel):
@@ -131,51 +146,70 @@ class UnifiedMessage(BaseModel):
     @classmethod
     def from_pandas_row(cls, row, strict: bool = False):
         """Create UnifiedMessage from pandas DataFrame row"""
-        data = {}
+        return cls.from_dataframe(row.to_frame().T.infer_objects(), strict=strict)[0]
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: pd.DataFrame,
+        strict: bool = False,
+        report: Optional["DataQualityReport"] = None,
+    ) -> List["UnifiedMessage"]:
+        """Create UnifiedMessage objects from a whole pandas DataFrame
+
+        NaN/empty/strip/dtype coercion and categorical validation run once per
+        column, so the models are built with model_construct (no re-validation).
+        Invalid categorical values raise in strict mode; otherwise they are
+        nulled and, if a report is given, recorded as a warning check on it.
+        """
+        df = strip_string_columns(df.reset_index(drop=True))
+        out = pd.DataFrame(index=df.index)
 
         for field_name, field_info in cls.model_fields.items():
             alias = field_info.alias or field_name
-            value = row.get(alias)
-
-            # Handle NaN values and type conversions with better error handling
-            if pd.isna(value) or value is None:
-                data[field_name] = None
-            elif isinstance(value, np.integer):
-                data[field_name] = int(value)
-            elif isinstance(value, np.floating):
-                if np.isnan(value):
-                    data[field_name] = None
-                else:
-                    data[field_name] = str(value)
-            elif isinstance(value, (int, float)):
-                if np.isnan(value):
-                    data[field_name] = None
-                else:
-                    data[field_name] = value
-            elif isinstance(value, str):
-                data[field_name] = value.strip() if value.strip() else None
+            if alias not in df.columns:
+                out[field_name] = None
+                continue
+
+            values = df[alias]
+            if int in get_args(field_info.annotation):
+                numbers = pd.to_numeric(values, errors="coerce")
+                if pd.api.types.is_float_dtype(numbers):
+                    numbers = numbers.astype("float64")
+                    numbers = numbers.where(numbers % 1 == 0)
+                out[field_name] = numbers.astype("Int64")
             else:
-                data[field_name] = str(value) if value is not None else None
+                out[field_name] = values[values.notna()].astype(str)
+
+        for field_name, allowed in CATEGORICAL_FIELDS.items():
+            invalid = out[field_name].notna() & ~out[field_name].isin(allowed)
+            if invalid.any():
+                if strict:
+                    raise ValueError(
+                        f"{field_name} must be one of {allowed} "
+                        f"({int(invalid.sum())} invalid rows)"
+                    )
+                invalid_count = int(invalid.sum())
+                logger.warning(f"Nulling {invalid_count} invalid {field_name} values")
+                if report is not None:
+                    report.checks.append(
+                        QualityCheckResult(
+                            check_name=f"invalid_{field_name}",
+                            check_type="count",
+                            value=invalid_count,
+                            description=f"Messages with {field_name} not in {allowed}",
+                            severity="warning",
+                        )
+                    )
+                out[field_name] = out[field_name].mask(invalid)
 
-        try:
-            return cls(**data)
-        except ValidationError as e:
-            if strict:
-                raise e
-            else:
-                # Try to create with minimal valid data
-                minimal_data = {k: v for k, v in data.items() if v is not None}
-                try:
-                    return cls(**minimal_data)
-                except ValidationError:
-                    # Last resort: create with just required fields as None
-                    safe_data = {}
-                    for field_name in cls.model_fields:
-                        if field_name in data:
-                            safe_data[field_name] = data[field_name]
-                        else:
-                            safe_data[field_name] = None
-                    return cls(**safe_data)
+        records = prep_for_models(out).to_dict(orient="records")
+        return [cls.model_construct(**record) for record in records]
+
+    @classmethod
+    def bulk_from_records(cls, records: List[Dict[str, Any]]) -> List["UnifiedMessage"]:
+        """Validate many records in one pass through pydantic-core"""
+        return _UNIFIED_MESSAGES_ADAPTER.validate_python(records)
 
 
 class DuplicateRecord(BaseModel):
@@ -210,42 +244,43 @@ class DuplicateRecord(BaseModel):
         return str(v)
 
     @classmethod
-    def from_pandas_row(cls, row, strict: bool = False):
-        """Create DuplicateRecord from pandas DataFrame row"""
-        data = {}
-
-        for field_name in cls.model_fields.keys():
-            value = row.get(field_name)
-
-            # Handle NaN values and type conversions
-            if pd.isna(value) or value is None:
-                # Provide defaults for required fields
-                if field_name == "id":
-                    data[field_name] = 0
-                elif field_name == "uuid":
-                    data[field_name] = "unknown-uuid"
-                elif field_name == "direction":
-                    data[field_name] = "unknown"
-                elif field_name == "inserted_at":
-                    data[field_name] = str(datetime.now())
-                else:
-                    data[field_name] = None
-            elif field_name == "inserted_at":
-                # Special handling for timestamp conversion
-                if hasattr(value, 'isoformat'):  # pandas Timestamp
-                    data[field_name] = str(value)
-                elif isinstance(value, datetime):
-                    data[field_name] = str(value)
-                else:
-                    data[field_name] = str(value)
-            elif isinstance(value, np.integer):
-                data[field_name] = int(value)
-            elif isinstance(value, str):
-                data[field_name] = value.strip() if value.strip() else None
-            else:
-                data[field_name] = value
+    def from_pandas_dataframe(cls, df: pd.DataFrame) -> List["DuplicateRecord"]:
+        """Create DuplicateRecords from a whole DataFrame, filling defaults for missing required fields"""
+        df = df.reindex(columns=list(cls.model_fields))
+        inserted_at = df["inserted_at"]
+        df = df.assign(
+            inserted_at=inserted_at[inserted_at.notna()].astype(str).reindex(df.index)
+        )
+        df = prep_for_models(df)
+        df = df.fillna(
+            {
+                "id": 0,
+                "uuid": "unknown-uuid",
+                "direction": "unknown",
+                "inserted_at": str(datetime.now()),
+            }
+        )
+        records = df.to_dict(orient="records")
+        try:
+            return cls.bulk_from_records(records)
+        except ValidationError as e:
+            # Skip only the rows that failed (e.g. a direction outside DIRECTIONS);
+            # list errors are located by the record's position
+            invalid = {error["loc"][0] for error in e.errors()}
+            logger.warning(f"Skipping {len(invalid)} invalid duplicate records: {e}")
+            return cls.bulk_from_records(
+                [record for i, record in enumerate(records) if i not in invalid]
+            )
+
+    @classmethod
+    def bulk_from_records(cls, records: List[Dict[str, Any]]) -> List["DuplicateRecord"]:
+        """Validate many records in one pass through pydantic-core"""
+        return _DUPLICATE_RECORDS_ADAPTER.validate_python(records)
+
 
-        return cls(**data)
+# List adapters are built once; validating a whole list amortizes validator setup
+_UNIFIED_MESSAGES_ADAPTER = TypeAdapter(List[UnifiedMessage])
+_DUPLICATE_RECORDS_ADAPTER = TypeAdapter(List[DuplicateRecord])
 
 
 class QualityCheckResult(BaseModel):
@@ -273,8 +308,10 @@ class DataQualityReport(BaseModel):
 
     def get_summary(self) -> Dict[str, Any]:
         """Get a summary of the data quality report"""
-        error_count = sum(1 for check in self.checks if check.severity == "error")
-        warning_count = sum(1 for check in self.checks if check.severity == "warning")
+        error_count = warning_count = 0
+        for check in self.checks:
+            error_count += check.severity == "error"
+            warning_count += check.severity == "warning"
 
         return {
             "total_messages": self.total_messages,
@@ -294,45 +331,39 @@ class DataQualityReport(BaseModel):
 # Utility functions for JSONL serialization
 
 
-def save_jsonl(data, filepath: str) -> None:
-    """Save list of models or DataFrame to JSONL file"""
-    import pandas as pd
-    import json
-    import logging
-
-    logger = logging.getLogger(__name__)
-
-    with open(filepath, "w", encoding="utf-8") as f:
-        if isinstance(data, pd.DataFrame):
-            # Save DataFrame data
-            for i, (_, row) in enumerate(data.iterrows()):
-                # Convert row to dict and handle NaT values
-                record = {}
-                for col, val in row.items():
-                    if pd.isna(val):
-                        record[col] = None
-                    else:
-                        record[col] = val
-                f.write(json.dumps(record, default=str) + "\n")
-
-                if i == 0:  # Log first record structure
-                    logger.info(f"First JSON record columns: {list(record.keys())}")
-        elif isinstance(data, list) and data and hasattr(data[0], "model_dump_json"):
-            # Handle list of BaseModel objects
-            for item in data:
-                f.write(item.model_dump_json(exclude_unset=True, by_alias=True) + "\n")
-        else:
-            # Handle list of dictionaries or other iterables
-            for item in data:
-                if hasattr(item, "model_dump_json"):
-                    f.write(
-                        item.model_dump_json(exclude_unset=True, by_alias=True) + "\n"
-                    )
-                else:
-                    f.write(json.dumps(item, default=str) + "\n")
-
-
-
-
+@lru_cache(maxsize=None)
+def _list_adapter(model_type: type) -> TypeAdapter:
+    """TypeAdapter for List[model_type], built once per model class"""
+    return TypeAdapter(List[model_type])
 
 
+def save_jsonl(data, filepath: str) -> None:
+    """Save list of models or DataFrame to JSONL file"""
+    if isinstance(data, pd.DataFrame):
+        # Serialize the whole frame as NDJSON in one call (NaN/NaT become null)
+        logger.info(f"First JSON record columns: {list(data.columns)}")
+        data.to_json(filepath, orient="records", lines=True, date_format="iso")
+        return
+
+    if isinstance(data, list) and data and isinstance(data[0], BaseModel):
+        # Dump the whole list of models through pydantic-core in one call
+        records = _list_adapter(type(data[0])).dump_python(
+            data, mode="json", exclude_unset=True, by_alias=True
+        )
+    else:
+        # Handle list of dictionaries or other iterables
+        records = [
+            item.model_dump(mode="json", exclude_unset=True, by_alias=True)
+            if hasattr(item, "model_dump")
+            else item
+            for item in data
+        ]
+
+    with open(filepath, "wb") as f:
+        f.write(
+            b"".join(
+                orjson.dumps(record, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+                + b"\n"
+                for record in records
+            )
+        )
@@ -3,8 +3,18 @@
 import logging
 import time
 import os
+from pathlib import Path
 from dotenv import load_dotenv
-import pandas as pd
+import orjson
+
+from adapters.extract_data import GSheetsExtractor
+from models import save_jsonl
+from transform.transform_data import DataTransformer
+
+try:
+    from adapters.upload_to_bigquery import BigQueryLoader
+except ImportError:  # google-cloud-bigquery is only needed for uploads
+    BigQueryLoader = None
 
 load_dotenv()
 
@@ -18,14 +28,12 @@ def save_results_locally(results: dict, output_dir: str = "output") -> None:
 
     Args:
         results: Dictionary containing ETL results with keys:
-            - unified_messages: DataFrame or list of UnifiedMessage objects
-            - duplicates: List of DuplicateRecord objects
+            - unified_messages: DataFrame or list of UnifiedMessage objects, or
+              None when the table was left in BigQuery
+            - duplicates: DataFrame of duplicate message records
             - quality_report: DataQualityReport object
         output_dir: Directory path to save files (relative to etl_pipeline/)
     """
-    from pathlib import Path
-    from models import save_jsonl
-
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
 
@@ -40,17 +48,19 @@ def save_results_locally(results: dict, output_dir: str = "output") -> None:
 
     # Save duplicates
     duplicates_file = output_path / "duplicates.jsonl"
-    if results.get("duplicates"):
+    if (results.get("duplicates") is not None and
+        not getattr(results["duplicates"], 'empty', False)):
         save_jsonl(results["duplicates"], str(duplicates_file))
         logger.info(f"Saved duplicates to {duplicates_file}")
 
     # Save quality report
     quality_file = output_path / "quality_report.json"
     if results.get("quality_report"):
-        with open(quality_file, "w", encoding="utf-8") as f:
+        with open(quality_file, "wb") as f:
             f.write(
-                results["quality_report"].model_dump_json(
-                    indent=2, exclude_unset=True
+                orjson.dumps(
+                    results["quality_report"].model_dump(exclude_unset=True),
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY,
                 )
             )
         logger.info(f"Saved quality report to {quality_file}")
@@ -66,27 +76,24 @@ def run_etl_pipeline():
 
     try:
         logger.info("Extracting data...")
-        from adapters.extract_data import GSheetsExtractor
-
         extractor = GSheetsExtractor()
         messages_df, statuses_df = extractor.extract_all()
 
-        logger.info("Transforming data...")
-        from transform.transform_data import DataTransformer
-
         transformer = DataTransformer(messages_df, statuses_df)
-        results = transformer.transform_all()
 
         # Upload to BigQuery (optional)
         enable_bigquery = os.getenv("ENABLE_BIGQUERY_UPLOAD", "true").lower() == "true"
 
         if not enable_bigquery:
             logger.info("BigQuery upload disabled by configuration. Skipping...")
+            logger.info("Transforming data...")
+            results = transformer.transform_all(in_memory=True)
             save_results_locally(results)
         else:
             logger.info("Uploading to BigQuery...")
             try:
-                from adapters.upload_to_bigquery import BigQueryLoader
+                if BigQueryLoader is None:
+                    raise Exception("google-cloud-bigquery is not installed")
 
                 loader = BigQueryLoader()
 
@@ -94,43 +101,40 @@ def run_etl_pipeline():
                     logger.warning("BigQuery client not available")
                     raise Exception("BigQuery client not initialized")
 
-                # Prepare tables for upload
-                tables_to_upload = {
-                    "unified_messages": results["unified_messages"],
-                    "duplicates": pd.DataFrame(
-                        [dup.model_dump() for dup in results["duplicates"]]
-                    ),
-                    "messages_raw": messages_df,
-                    "statuses_raw": statuses_df,
-                }
-
-                # Add status flat table if available
-                status_flat_df = getattr(transformer, "status_flat", None)
-                if status_flat_df is not None:
-                    tables_to_upload["message_status_flat"] = status_flat_df
-
                 # Ensure dataset exists
                 loader.ensure_dataset_exists()
 
-                # Upload each table
-                upload_success_count = 0
-                for table_name, df in tables_to_upload.items():
-                    if loader.load_table(df, table_name, if_exists="replace"):
-                        upload_success_count += 1
-
-                logger.info(f"Successfully uploaded {upload_success_count}/{len(tables_to_upload)} tables to BigQuery")
-
-                # Run BigQuery transformations
-                logger.info("Running SQL transformations in BigQuery...")
-                from transform.sql_transform import run_sql_transforms
+                # Load the extracted frames, whose columns are already coerced to
+                # their RawMessage/RawStatus types, so the SQL transforms see the
+                # same data and types as the pandas path
+                raw_tables = {
+                    "messages_raw": messages_df,
+                    "statuses_raw": statuses_df,
+                }
+                if any(df.empty for df in raw_tables.values()):
+                    raise Exception("Raw sheets were not extracted")
+                raw_success_count = loader.load_tables_parallel(
+                    raw_tables, if_exists="replace"
+                )
+                if raw_success_count < len(raw_tables):
+                    raise Exception("Failed to load the raw tables")
+                logger.info(
+                    f"Successfully uploaded {raw_success_count}/{len(raw_tables)} tables to BigQuery"
+                )
 
-                run_sql_transforms(os.getenv("BIGQUERY_DATASET", "whatsapp_healthcare"))
+                # unified_messages, duplicates and the quality tables are built in BigQuery
+                logger.info("Transforming data in BigQuery...")
+                results = transformer.transform_all(
+                    dataset=os.getenv("BIGQUERY_DATASET", "whatsapp_healthcare")
+                )
                 logger.info("SQL transformations completed")
 
                 logger.info("BigQuery upload completed")
 
             except Exception as e:
                 logger.warning(f"BigQuery failed: {e}")
+                logger.info("Transforming data locally...")
+                results = transformer.transform_all(in_memory=True)
                 save_results_locally(results)
 
         # Summary
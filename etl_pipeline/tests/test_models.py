@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models import DataQualityReport, DuplicateRecord, UnifiedMessage
+
+
+def _duplicates_frame(directions):
+    n = len(directions)
+    return pd.DataFrame(
+        {
+            "id": range(1, n + 1),
+            "content": ["hello"] * n,
+            "inserted_at": pd.to_datetime(["2024-01-01 10:00:00"] * n, utc=True),
+            "uuid": [f"uuid-{i}" for i in range(n)],
+            "direction": directions,
+        }
+    )
+
+
+def test_from_pandas_dataframe_builds_records():
+    records = DuplicateRecord.from_pandas_dataframe(
+        _duplicates_frame(["inbound", "outbound"])
+    )
+
+    assert [r.direction for r in records] == ["inbound", "outbound"]
+    assert records[0].inserted_at == "2024-01-01 10:00:00+00:00"
+    assert records[0].duplicate_group is None
+
+
+def test_from_pandas_dataframe_skips_only_invalid_directions():
+    records = DuplicateRecord.from_pandas_dataframe(
+        _duplicates_frame(["inbound", None, "sideways", "outbound"])
+    )
+
+    assert [r.id for r in records] == [1, 4]
+
+
+def _messages_frame(**overrides):
+    data = {
+        "id": [1, 2],
+        "uuid": ["uuid-1", "uuid-2"],
+        "message_type": ["text", "image"],
+        "content": ["hello", "world"],
+        "author_type": ["USER", "OWNER"],
+        "direction": ["inbound", "outbound"],
+        "inserted_at": pd.to_datetime(["2024-01-01 10:00:00"] * 2, utc=True),
+    }
+    data.update(overrides)
+    return pd.DataFrame(data)
+
+
+def test_from_dataframe_coerces_int_fields():
+    messages = UnifiedMessage.from_dataframe(
+        _messages_frame(id=["12.0", "abc"], sent=[1.5, 3.0])
+    )
+
+    assert [m.id for m in messages] == [12, None]
+    assert [m.sent for m in messages] == [None, 3]
+    assert isinstance(messages[0].id, int)
+
+
+def test_from_dataframe_nulls_nan_and_blank_strings():
+    messages = UnifiedMessage.from_dataframe(
+        _messages_frame(content=["  ", np.nan], external_id=[" e1 ", None])
+    )
+
+    assert [m.content for m in messages] == [None, None]
+    assert [m.external_id for m in messages] == ["e1", None]
+    assert messages[0].inserted_at == "2024-01-01 10:00:00+00:00"
+
+
+def test_from_dataframe_strict_rejects_invalid_direction():
+    with pytest.raises(ValueError, match="direction"):
+        UnifiedMessage.from_dataframe(
+            _messages_frame(direction=["inbound", "sideways"]), strict=True
+        )
+
+
+def test_from_dataframe_lenient_nulls_invalid_direction_and_reports_it():
+    report = DataQualityReport()
+
+    messages = UnifiedMessage.from_dataframe(
+        _messages_frame(direction=["inbound", "sideways"]), report=report
+    )
+
+    assert [m.direction for m in messages] == ["inbound", None]
+    [check] = report.checks
+    assert check.check_name == "invalid_direction"
+    assert check.value == 1
+    assert check.severity == "warning"
+
+
+def test_from_pandas_row_matches_from_dataframe():
+    df = _messages_frame(id=["12.0", "2"], content=[" hello ", "world"])
+
+    assert UnifiedMessage.from_pandas_row(df.iloc[0]) == (
+        UnifiedMessage.from_dataframe(df)[0]
+    )
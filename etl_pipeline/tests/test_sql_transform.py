@@ -0,0 +1,28 @@
+import logging
+
+import pytest
+
+bigquery = pytest.importorskip("google.cloud.bigquery")
+
+from transform.sql_transform import _query_job_config  # noqa: E402
+
+
+def test_query_job_config_routes_to_reservation(monkeypatch):
+    if not hasattr(bigquery.QueryJobConfig, "reservation"):
+        pytest.skip("google-cloud-bigquery predates job reservations")
+    monkeypatch.setenv("BIGQUERY_RESERVATION", "projects/p/locations/US/reservations/etl")
+
+    assert _query_job_config().reservation == "projects/p/locations/US/reservations/etl"
+
+
+def test_query_job_config_ignores_reservation_on_old_client(monkeypatch, caplog):
+    monkeypatch.setenv("BIGQUERY_RESERVATION", "projects/p/locations/US/reservations/etl")
+    for cls in bigquery.QueryJobConfig.__mro__:
+        if "reservation" in vars(cls):
+            monkeypatch.delattr(cls, "reservation")
+
+    with caplog.at_level(logging.WARNING):
+        job_config = _query_job_config()
+
+    assert "reservation" not in job_config._properties["query"]
+    assert "ignoring it" in caplog.text
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from transform.transform_data import DataTransformer
+
+
+def _ts(value):
+    return pd.Timestamp(value, tz="UTC")
+
+
+@pytest.fixture
+def messages_df():
+    return pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "uuid": ["m1", "m2", "m3"],
+            "content": ["hello", "hi", "bye"],
+            "inserted_at": pd.to_datetime(["2024-01-01"] * 3, utc=True),
+        }
+    )
+
+
+def _statuses_df(id_dtype):
+    # m3 has no statuses, and no message is ever "deleted"
+    return pd.DataFrame(
+        {
+            "message_uuid": ["m1", "m1", "m1", "m1", "m2"],
+            "status": ["sent", "delivered", "delivered", "delivered", "read"],
+            "timestamp": [
+                _ts("2024-01-01 10:00"),
+                _ts("2024-01-01 11:00"),
+                pd.NaT,
+                _ts("2024-01-01 10:30"),
+                _ts("2024-01-02 09:00"),
+            ],
+            "uuid": ["s1", "s2", "s3", "s4", "s5"],
+            "id": pd.array([10, 11, 12, 13, 14], dtype=id_dtype),
+        }
+    )
+
+
+def _unified(messages_df, id_dtype="int64"):
+    unified = DataTransformer(messages_df, _statuses_df(id_dtype)).transform_unified_view()
+    return unified.set_index("message_uuid")
+
+
+def test_transform_unified_view_counts_statuses_per_message(messages_df):
+    unified = _unified(messages_df)
+
+    assert list(unified.index) == ["m1", "m2", "m3"]
+    assert unified.loc["m1", ["sent", "delivered", "read", "failed", "deleted"]].tolist() == [
+        1, 3, 0, 0, 0
+    ]
+    assert unified.loc["m2", ["sent", "delivered", "read"]].tolist() == [0, 0, 1]
+    # Like the SQL LEFT JOIN, a message without statuses has no counts
+    assert unified.loc["m3", ["sent", "delivered", "read", "failed", "deleted"]].isna().all()
+
+
+def test_transform_unified_view_keeps_latest_timestamped_status(messages_df):
+    unified = _unified(messages_df)
+
+    # A missing timestamp never wins over a real one
+    assert unified.loc["m1", "delivered_timestamp"] == _ts("2024-01-01 11:00")
+    assert unified.loc["m1", "delivered_status_uuid"] == "s2"
+    assert unified.loc["m1", "delivered_status_id"] == 11
+    assert unified.loc["m1", "sent_status_uuid"] == "s1"
+    assert pd.isna(unified.loc["m2", "delivered_timestamp"])
+
+
+def test_transform_unified_view_status_without_rows(messages_df):
+    unified = _unified(messages_df)
+
+    for suffix in ("timestamp", "status_uuid", "status_id"):
+        assert unified[f"deleted_{suffix}"].isna().all()
+    assert isinstance(unified["deleted_timestamp"].dtype, pd.DatetimeTZDtype)
+
+
+@pytest.mark.parametrize(
+    "id_dtype, expected_dtype",
+    [
+        # numpy int64 cannot hold the missing ids of absent statuses
+        ("int64", "float64"),
+        ("int64[pyarrow]", "int64[pyarrow]"),
+    ],
+)
+def test_transform_unified_view_status_id_dtype(messages_df, id_dtype, expected_dtype):
+    unified = _unified(messages_df, id_dtype)
+
+    for status in ("sent", "delivered", "read", "failed", "deleted"):
+        assert unified[f"{status}_status_id"].dtype == expected_dtype
+    assert unified.loc["m1", "delivered_status_id"] == 11
+    assert pd.isna(unified.loc["m3", "delivered_status_id"])
@@ -0,0 +1,100 @@
+import io
+from datetime import datetime, timezone
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+from google.api_core.exceptions import NotFound  # noqa: E402
+
+from adapters.upload_to_bigquery import BigQueryLoader, _df_to_parquet  # noqa: E402
+
+
+def test_df_to_parquet_accepts_arrow_typed_frame():
+    # Frames read back from BigQuery use ArrowDtype columns
+    table = pa.table(
+        {
+            "id": pa.array([1, None], pa.int64()),
+            "content": pa.array(["hello", None], pa.string()),
+            "inserted_at": pa.array(
+                [datetime(2024, 1, 1, 10, tzinfo=timezone.utc), None],
+                pa.timestamp("us", tz="UTC"),
+            ),
+        }
+    )
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    df["duplicate_group"] = None
+
+    buf = _df_to_parquet(df)
+
+    assert isinstance(buf, io.BytesIO)
+    result = pq.read_table(buf)
+    assert result.schema.field("id").type == pa.int64()
+    assert result.schema.field("inserted_at").type == pa.timestamp("us", tz="UTC")
+    group_type = result.schema.field("duplicate_group").type
+    assert pa.types.is_string(group_type) or pa.types.is_large_string(group_type)
+    assert result.column("id").to_pylist() == [1, None]
+    assert result.column("content").to_pylist() == ["hello", None]
+
+
+def test_df_to_parquet_keeps_numpy_frame_dtypes():
+    df = pd.DataFrame({"id": [1, 2], "content": ["a", None]})
+
+    result = pq.read_table(_df_to_parquet(df))
+
+    assert result.column_names == ["id", "content"]
+    assert result.column("content").to_pylist() == ["a", None]
+
+
+def _loader(client):
+    loader = BigQueryLoader.__new__(BigQueryLoader)
+    loader.project_id = "project"
+    loader.dataset_id = "dataset"
+    loader.client = client
+    return loader
+
+
+def test_load_tables_parallel_loads_raw_frames_as_clustered_parquet():
+    client = mock.MagicMock()
+    client.get_table.side_effect = NotFound("missing")
+    loads = {}
+
+    def load_table_from_file(buf, table_ref, job_config):
+        loads[table_ref] = (pq.read_table(buf), job_config)
+        return mock.MagicMock()
+
+    client.load_table_from_file.side_effect = load_table_from_file
+    messages = pd.DataFrame(
+        {
+            "id": pd.array([1, 2], dtype="int64[pyarrow]"),
+            "uuid": pd.array(["a", "b"], dtype="string[pyarrow]"),
+            "inserted_at": pd.to_datetime(["2024-01-01", "2024-01-02"], utc=True),
+        }
+    )
+
+    assert _loader(client).load_tables_parallel({"messages_raw": messages}) == 1
+
+    table, job_config = loads["project.dataset.messages_raw"]
+    assert table.schema.field("id").type == pa.int64()
+    assert pa.types.is_timestamp(table.schema.field("inserted_at").type)
+    assert job_config.clustering_fields == ["uuid"]
+    assert job_config.write_disposition == "WRITE_TRUNCATE"
+
+
+def test_load_tables_parallel_counts_only_successful_loads():
+    client = mock.MagicMock()
+    client.get_table.side_effect = NotFound("missing")
+    failed_job = mock.MagicMock()
+    failed_job.result.side_effect = RuntimeError("load failed")
+    client.load_table_from_file.side_effect = [mock.MagicMock(), failed_job]
+    frame = pd.DataFrame({"uuid": ["a"], "message_uuid": ["a"]})
+
+    count = _loader(client).load_tables_parallel(
+        {"messages_raw": frame, "statuses_raw": frame}
+    )
+
+    assert count == 1
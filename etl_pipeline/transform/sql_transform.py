@@ -2,6 +2,9 @@
 
 import os
 import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 from google.oauth2 import service_account
 from dotenv import load_dotenv
@@ -12,14 +15,19 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+def _load_credentials() -> Optional[service_account.Credentials]:
+    credentials_path = os.getenv("GCP_SERVICE_KEY_PATH", "service-key.json")
+    if os.path.exists(credentials_path):
+        return service_account.Credentials.from_service_account_file(credentials_path)
+    return None
+
+
+@lru_cache(maxsize=1)
 def _get_bq_client() -> bigquery.Client:
     project_id = os.getenv("GCP_PROJECT_ID")
-    credentials_path = os.getenv("GCP_SERVICE_KEY_PATH", "service-key.json")
     try:
-        if os.path.exists(credentials_path):
-            credentials = service_account.Credentials.from_service_account_file(
-                credentials_path
-            )
+        credentials = _load_credentials()
+        if credentials is not None:
             return bigquery.Client(credentials=credentials, project=project_id)
         return bigquery.Client(project=project_id)
     except Exception as e:
@@ -27,82 +35,172 @@ def _get_bq_client() -> bigquery.Client:
         raise
 
 
-def create_message_status_flat(dataset: str) -> None:
+@lru_cache(maxsize=1)
+def _get_bq_reader():
+    """Storage Read API client for columnar reads; None if the library is not installed"""
+    try:
+        from google.cloud.bigquery_storage_v1 import BigQueryReadClient
+    except ImportError:
+        logger.warning("google-cloud-bigquery-storage not installed; reading over REST")
+        return None
+    return BigQueryReadClient(credentials=_load_credentials())
+
+
+def read_table_as_arrow(table_name: str, dataset: str = None):
+    """Read a whole table as a pyarrow Table, streamed over the Storage Read API"""
+    dataset = dataset or os.getenv("BIGQUERY_DATASET", "whatsapp_healthcare")
     client = _get_bq_client()
-    project = client.project
+    rows = client.list_rows(f"{client.project}.{dataset}.{table_name}")
+    return rows.to_arrow(bqstorage_client=_get_bq_reader())
+
+
+def count_table_rows(table_name: str, dataset: str = None) -> int:
+    """Row count from the table's metadata, without scanning or downloading it"""
+    dataset = dataset or os.getenv("BIGQUERY_DATASET", "whatsapp_healthcare")
+    client = _get_bq_client()
+    return client.get_table(f"{client.project}.{dataset}.{table_name}").num_rows
+
+
+def _query_job_config() -> bigquery.QueryJobConfig:
+    """Job config shared by the ETL queries; BIGQUERY_RESERVATION routes them to a slot pool"""
+    job_config = bigquery.QueryJobConfig(
+        use_query_cache=True, labels={"pipeline": "whatsapp-etl"}
+    )
+    reservation = os.getenv("BIGQUERY_RESERVATION")
+    if reservation:
+        # QueryJobConfig.reservation only exists from google-cloud-bigquery 3.33.0
+        if hasattr(bigquery.QueryJobConfig, "reservation"):
+            job_config.reservation = reservation
+        else:
+            logger.warning(
+                "BIGQUERY_RESERVATION is set but google-cloud-bigquery "
+                f"{bigquery.__version__} predates job reservations; ignoring it"
+            )
+    return job_config
 
-    query = f"""
-CREATE OR REPLACE TABLE `{project}.{dataset}.message_status_flat` AS
+
+def _submit(client: bigquery.Client, query: str, label: str) -> bigquery.QueryJob:
+    """Dry-run query to log and cap its bytes processed, then start it for real"""
+    max_bytes = int(os.getenv("BIGQUERY_MAX_BYTES_PER_QUERY", 500 * 10**9))
+    dry_run = client.query(
+        query, job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    )
+    bytes_processed = dry_run.total_bytes_processed or 0
+    logger.info(f"{label}: {bytes_processed / 1e9:.2f} GB to process")
+    if bytes_processed > max_bytes:
+        raise ValueError(
+            f"{label} would process {bytes_processed / 1e9:.2f} GB, "
+            f"above the {max_bytes / 1e9:.2f} GB limit (BIGQUERY_MAX_BYTES_PER_QUERY)"
+        )
+    return client.query(query, job_config=_query_job_config())
+
+
+def _drop_if_partitioning_differs(client: bigquery.Client, target: str, field: str) -> None:
+    """CREATE OR REPLACE cannot change a table's partitioning, so drop an outdated table first"""
+    try:
+        table = client.get_table(target)
+    except NotFound:
+        return
+    partitioning = table.time_partitioning
+    if partitioning is None or partitioning.field != field:
+        logger.info(f"Dropping {target} to re-create it partitioned by {field}")
+        client.delete_table(target, not_found_ok=True)
+
+
+# SQL is built once per (project, dataset), so reruns reuse identical statement text
+@lru_cache(maxsize=None)
+def _message_status_flat_sql(project: str, dataset: str) -> str:
+    return f"""
+CREATE OR REPLACE TABLE `{project}.{dataset}.message_status_flat`
+CLUSTER BY message_uuid
+AS
+WITH ranked AS (
+  -- Rank each message's statuses once; rn = 1 is the latest row per status
+  SELECT
+    *,
+    ROW_NUMBER() OVER (PARTITION BY message_uuid, status ORDER BY timestamp DESC) AS rn
+  FROM `{project}.{dataset}.statuses_raw`
+  WHERE message_uuid IS NOT NULL
+)
 SELECT
   message_uuid,
-  -- Count occurrences of each status
-  COUNTIF(status = 'sent') AS sent,
-  COUNTIF(status = 'delivered') AS delivered,
-  COUNTIF(status = 'read') AS read,
-  COUNTIF(status = 'failed') AS failed,
-  COUNTIF(status = 'deleted') AS deleted,
+  -- Count occurrences of each status; one read of status feeds all five sums
+  SUM(CAST(status = 'sent' AS INT64)) AS sent,
+  SUM(CAST(status = 'delivered' AS INT64)) AS delivered,
+  SUM(CAST(status = 'read' AS INT64)) AS read,
+  SUM(CAST(status = 'failed' AS INT64)) AS failed,
+  SUM(CAST(status = 'deleted' AS INT64)) AS deleted,
 
   -- Latest sent status info
-  ARRAY_AGG(IF(status = 'sent', timestamp, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS sent_timestamp,
-  ARRAY_AGG(IF(status = 'sent', inserted_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS sent_inserted_at,
-  ARRAY_AGG(IF(status = 'sent', updated_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS sent_updated_at,
-  ARRAY_AGG(IF(status = 'sent', uuid, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS sent_status_uuid,
-  ARRAY_AGG(IF(status = 'sent', id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS sent_status_id,
-  ARRAY_AGG(IF(status = 'sent', message_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS sent_status_message_id,
-  ARRAY_AGG(IF(status = 'sent', number_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS sent_status_number_id,
+  MAX(IF(status = 'sent' AND rn = 1, timestamp, NULL)) AS sent_timestamp,
+  MAX(IF(status = 'sent' AND rn = 1, inserted_at, NULL)) AS sent_inserted_at,
+  MAX(IF(status = 'sent' AND rn = 1, updated_at, NULL)) AS sent_updated_at,
+  MAX(IF(status = 'sent' AND rn = 1, uuid, NULL)) AS sent_status_uuid,
+  MAX(IF(status = 'sent' AND rn = 1, id, NULL)) AS sent_status_id,
+  MAX(IF(status = 'sent' AND rn = 1, message_id, NULL)) AS sent_status_message_id,
+  MAX(IF(status = 'sent' AND rn = 1, number_id, NULL)) AS sent_status_number_id,
 
   -- Latest delivered status info
-  ARRAY_AGG(IF(status = 'delivered', timestamp, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS delivered_timestamp,
-  ARRAY_AGG(IF(status = 'delivered', inserted_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS delivered_inserted_at,
-  ARRAY_AGG(IF(status = 'delivered', updated_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS delivered_updated_at,
-  ARRAY_AGG(IF(status = 'delivered', uuid, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS delivered_status_uuid,
-  ARRAY_AGG(IF(status = 'delivered', id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS delivered_status_id,
-  ARRAY_AGG(IF(status = 'delivered', message_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS delivered_status_message_id,
-  ARRAY_AGG(IF(status = 'delivered', number_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS delivered_status_number_id,
+  MAX(IF(status = 'delivered' AND rn = 1, timestamp, NULL)) AS delivered_timestamp,
+  MAX(IF(status = 'delivered' AND rn = 1, inserted_at, NULL)) AS delivered_inserted_at,
+  MAX(IF(status = 'delivered' AND rn = 1, updated_at, NULL)) AS delivered_updated_at,
+  MAX(IF(status = 'delivered' AND rn = 1, uuid, NULL)) AS delivered_status_uuid,
+  MAX(IF(status = 'delivered' AND rn = 1, id, NULL)) AS delivered_status_id,
+  MAX(IF(status = 'delivered' AND rn = 1, message_id, NULL)) AS delivered_status_message_id,
+  MAX(IF(status = 'delivered' AND rn = 1, number_id, NULL)) AS delivered_status_number_id,
 
   -- Latest read status info
-  ARRAY_AGG(IF(status = 'read', timestamp, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS read_timestamp,
-  ARRAY_AGG(IF(status = 'read', inserted_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS read_inserted_at,
-  ARRAY_AGG(IF(status = 'read', updated_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS read_updated_at,
-  ARRAY_AGG(IF(status = 'read', uuid, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS read_status_uuid,
-  ARRAY_AGG(IF(status = 'read', id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS read_status_id,
-  ARRAY_AGG(IF(status = 'read', message_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS read_status_message_id,
-  ARRAY_AGG(IF(status = 'read', number_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS read_status_number_id,
+  MAX(IF(status = 'read' AND rn = 1, timestamp, NULL)) AS read_timestamp,
+  MAX(IF(status = 'read' AND rn = 1, inserted_at, NULL)) AS read_inserted_at,
+  MAX(IF(status = 'read' AND rn = 1, updated_at, NULL)) AS read_updated_at,
+  MAX(IF(status = 'read' AND rn = 1, uuid, NULL)) AS read_status_uuid,
+  MAX(IF(status = 'read' AND rn = 1, id, NULL)) AS read_status_id,
+  MAX(IF(status = 'read' AND rn = 1, message_id, NULL)) AS read_status_message_id,
+  MAX(IF(status = 'read' AND rn = 1, number_id, NULL)) AS read_status_number_id,
 
   -- Latest failed status info
-  ARRAY_AGG(IF(status = 'failed', timestamp, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS failed_timestamp,
-  ARRAY_AGG(IF(status = 'failed', inserted_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS failed_inserted_at,
-  ARRAY_AGG(IF(status = 'failed', updated_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS failed_updated_at,
-  ARRAY_AGG(IF(status = 'failed', uuid, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS failed_status_uuid,
-  ARRAY_AGG(IF(status = 'failed', id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS failed_status_id,
-  ARRAY_AGG(IF(status = 'failed', message_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS failed_status_message_id,
-  ARRAY_AGG(IF(status = 'failed', number_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS failed_status_number_id,
+  MAX(IF(status = 'failed' AND rn = 1, timestamp, NULL)) AS failed_timestamp,
+  MAX(IF(status = 'failed' AND rn = 1, inserted_at, NULL)) AS failed_inserted_at,
+  MAX(IF(status = 'failed' AND rn = 1, updated_at, NULL)) AS failed_updated_at,
+  MAX(IF(status = 'failed' AND rn = 1, uuid, NULL)) AS failed_status_uuid,
+  MAX(IF(status = 'failed' AND rn = 1, id, NULL)) AS failed_status_id,
+  MAX(IF(status = 'failed' AND rn = 1, message_id, NULL)) AS failed_status_message_id,
+  MAX(IF(status = 'failed' AND rn = 1, number_id, NULL)) AS failed_status_number_id,
 
   -- Latest deleted status info
-  ARRAY_AGG(IF(status = 'deleted', timestamp, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS deleted_timestamp,
-  ARRAY_AGG(IF(status = 'deleted', inserted_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS deleted_inserted_at,
-  ARRAY_AGG(IF(status = 'deleted', updated_at, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS deleted_updated_at,
-  ARRAY_AGG(IF(status = 'deleted', uuid, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS deleted_status_uuid,
-  ARRAY_AGG(IF(status = 'deleted', id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS deleted_status_id,
-  ARRAY_AGG(IF(status = 'deleted', message_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS deleted_status_message_id,
-  ARRAY_AGG(IF(status = 'deleted', number_id, NULL) IGNORE NULLS ORDER BY timestamp DESC LIMIT 1)[OFFSET(0)] AS deleted_status_number_id
-
-FROM `{project}.{dataset}.statuses_raw`
-WHERE message_uuid IS NOT NULL
+  MAX(IF(status = 'deleted' AND rn = 1, timestamp, NULL)) AS deleted_timestamp,
+  MAX(IF(status = 'deleted' AND rn = 1, inserted_at, NULL)) AS deleted_inserted_at,
+  MAX(IF(status = 'deleted' AND rn = 1, updated_at, NULL)) AS deleted_updated_at,
+  MAX(IF(status = 'deleted' AND rn = 1, uuid, NULL)) AS deleted_status_uuid,
+  MAX(IF(status = 'deleted' AND rn = 1, id, NULL)) AS deleted_status_id,
+  MAX(IF(status = 'deleted' AND rn = 1, message_id, NULL)) AS deleted_status_message_id,
+  MAX(IF(status = 'deleted' AND rn = 1, number_id, NULL)) AS deleted_status_number_id
+
+FROM ranked
 GROUP BY message_uuid
 """
 
-    logger.info("Creating message_status_flat table...")
-    client.query(query).result()
-    logger.info("Created message_status_flat")
 
-
-def create_unified_messages(dataset: str) -> None:
-    client = _get_bq_client()
+def create_message_status_flat(
+    dataset: str, client: Optional[bigquery.Client] = None
+) -> bigquery.QueryJob:
+    """Submit the message_status_flat rebuild without waiting on it"""
+    client = client or _get_bq_client()
     project = client.project
 
-    query = f"""
-CREATE OR REPLACE TABLE `{project}.{dataset}.unified_messages` AS
+    query = _message_status_flat_sql(project, dataset)
+
+    logger.info("Creating message_status_flat table...")
+    return _submit(client, query, "message_status_flat")
+
+
+@lru_cache(maxsize=None)
+def _unified_messages_sql(project: str, dataset: str) -> str:
+    return f"""
+CREATE OR REPLACE TABLE `{project}.{dataset}.unified_messages`
+PARTITION BY DATE(message_inserted_at)
+CLUSTER BY message_uuid, direction, author_type
+AS
 SELECT
   m.id AS message_id,
   m.uuid AS message_uuid,
@@ -118,7 +216,7 @@ SELECT
   m.is_deleted,
   m.rendered_content,
   m.source_type,
-  m.inserted_at AS message_inserted_at,
+  SAFE_CAST(m.inserted_at AS TIMESTAMP) AS message_inserted_at,
   m.updated_at  AS message_updated_at,
   m.last_status AS msg_last_status_raw,
   m.last_status_timestamp AS msg_last_status_timestamp_raw,
@@ -138,22 +236,54 @@ LEFT JOIN `{project}.{dataset}.message_status_flat` s
   ON m.uuid = s.message_uuid
 """
 
-    logger.info("Creating unified_messages table...")
-    client.query(query).result()
-    logger.info("Created unified_messages")
 
-
-def create_data_quality_tables(dataset: str) -> None:
-    client = _get_bq_client()
+def create_unified_messages(
+    dataset: str, client: Optional[bigquery.Client] = None
+) -> bigquery.QueryJob:
+    """Submit the unified_messages rebuild; message_status_flat must be finished first"""
+    client = client or _get_bq_client()
     project = client.project
 
+    target = f"{project}.{dataset}.unified_messages"
+    _drop_if_partitioning_differs(client, target, "message_inserted_at")
+
+    query = _unified_messages_sql(project, dataset)
+
+    logger.info("Creating unified_messages table...")
+    return _submit(client, query, "unified_messages")
+
+
+@lru_cache(maxsize=None)
+def _data_quality_sql(project: str, dataset: str) -> Tuple[Tuple[str, str], ...]:
+    """(table name, DDL) pairs for the data quality tables"""
     # Check for duplicate messages
     dq_duplicates = f"""
-CREATE OR REPLACE TABLE `{project}.{dataset}.dq_duplicate_messages` AS
+CREATE OR REPLACE TABLE `{project}.{dataset}.dq_duplicate_messages`
+CLUSTER BY message_id
+AS
 SELECT id AS message_id, COUNT(*) AS dup_count
 FROM `{project}.{dataset}.messages_raw`
 GROUP BY id
 HAVING COUNT(*) > 1
+"""
+
+    # Check for messages sharing identical, non-blank content; clustering on the
+    # content hash keeps each duplicate group together
+    dq_duplicate_content = f"""
+CREATE OR REPLACE TABLE `{project}.{dataset}.dq_duplicate_content`
+CLUSTER BY content_hash
+AS
+SELECT
+  id,
+  content,
+  inserted_at,
+  uuid,
+  direction,
+  FARM_FINGERPRINT(content) AS content_hash,
+  COUNT(*) OVER (PARTITION BY content) AS dup_count
+FROM `{project}.{dataset}.messages_raw`
+WHERE content IS NOT NULL AND TRIM(content) != ''
+QUALIFY dup_count > 1
 """
 
     # Check for missing required fields
@@ -164,21 +294,77 @@ FROM `{project}.{dataset}.messages_raw`
 WHERE id IS NULL OR uuid IS NULL OR inserted_at IS NULL
 """
 
-    logger.info("Creating data quality tables...")
-    for name, query in [
+    return (
         ("dq_duplicate_messages", dq_duplicates),
+        ("dq_duplicate_content", dq_duplicate_content),
         ("dq_missing_required_fields", dq_missing),
-    ]:
+    )
+
+
+def create_data_quality_tables(
+    dataset: str, client: Optional[bigquery.Client] = None
+) -> List[bigquery.QueryJob]:
+    """Submit the data quality table rebuilds without waiting on them"""
+    client = client or _get_bq_client()
+    project = client.project
+
+    logger.info("Creating data quality tables...")
+    jobs = []
+    for name, query in _data_quality_sql(project, dataset):
         logger.info(f"Creating {name}")
-        client.query(query).result()
-    logger.info("Data quality tables created")
+        jobs.append(_submit(client, query, name))
+    return jobs
+
+
+@lru_cache(maxsize=None)
+def _duplicates_sql(project: str, dataset: str) -> str:
+    # Same columns as DuplicateRecord
+    return f"""
+CREATE OR REPLACE TABLE `{project}.{dataset}.duplicates` AS
+SELECT
+  id,
+  content,
+  inserted_at,
+  uuid,
+  direction,
+  CAST(NULL AS STRING) AS duplicate_group
+FROM `{project}.{dataset}.dq_duplicate_content`
+"""
+
+
+def create_duplicates_table(
+    dataset: str, client: Optional[bigquery.Client] = None
+) -> bigquery.QueryJob:
+    """Submit the duplicates rebuild; dq_duplicate_content must be finished first"""
+    client = client or _get_bq_client()
+
+    logger.info("Creating duplicates table...")
+    return _submit(client, _duplicates_sql(client.project, dataset), "duplicates")
 
 
 def run_sql_transforms(dataset: str = None) -> None:
+    """Rebuild the derived tables from the raw tables loaded into dataset"""
     dataset = dataset or os.getenv("BIGQUERY_DATASET", "whatsapp_healthcare")
-    create_message_status_flat(dataset)
-    create_unified_messages(dataset)
-    create_data_quality_tables(dataset)
+    client = _get_bq_client()
+
+    # message_status_flat and the data quality tables are independent, so run them
+    # together; unified_messages joins message_status_flat and has to wait for it
+    flat_job = create_message_status_flat(dataset, client=client)
+    dq_jobs = create_data_quality_tables(dataset, client=client)
+    flat_job.result()
+    logger.info("Created message_status_flat")
+
+    unified_job = create_unified_messages(dataset, client=client)
+
+    for job in dq_jobs:
+        job.result()
+    logger.info("Data quality tables created")
+    duplicates_job = create_duplicates_table(dataset, client=client)
+
+    unified_job.result()
+    logger.info("Created unified_messages")
+    duplicates_job.result()
+    logger.info("Created duplicates")
 
 
 
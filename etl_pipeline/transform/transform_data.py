@@ -2,7 +2,9 @@
 
 import pandas as pd
 import logging
-from typing import Dict, Any, List
+import os
+from functools import wraps
+from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,16 +15,53 @@ from models import (
     DuplicateRecord,
     QualityCheckResult,
     DataQualityReport,
+    strip_string_columns,
 )
 
+try:
+    from transform.sql_transform import (
+        count_table_rows,
+        read_table_as_arrow,
+        run_sql_transforms,
+    )
+except ImportError:  # google-cloud-bigquery is only needed for the BigQuery transforms
+    count_table_rows = read_table_as_arrow = run_sql_transforms = None
+
+
+def _copy_on_write(method):
+    """Run method with pandas copy-on-write, so derived frames share buffers until written"""
+    # Always on from pandas 3.0; on 2.x scope it to the call rather than the process
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return method
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with pd.option_context("mode.copy_on_write", True):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def _pivot_dtype(dtype):
+    """dtype for a pivoted copy of a column, whose absent statuses become missing"""
+    # Extension dtypes (nullable ints, strings, tz-aware timestamps) hold NA as is
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return dtype
+    # numpy integers and bools cannot hold NaN
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return "float64"
+    return dtype
+
 
 class DataTransformer:
     """Transform WhatsApp messaging data according to project requirements"""
 
     def __init__(self, messages_df: pd.DataFrame, statuses_df: pd.DataFrame):
-        self.messages_df = messages_df.copy()
-        self.statuses_df = statuses_df.copy()
+        # clean_data rebinds rather than mutates, so the caller's frames are never changed
+        self.messages_df = messages_df
+        self.statuses_df = statuses_df
 
+    @_copy_on_write
     def clean_data(self) -> None:
         """Basic data cleaning"""
         logger.info("Cleaning data...")
@@ -39,20 +78,32 @@ class DataTransformer:
             )
 
         # Convert date columns
-        date_columns = ["inserted_at", "updated_at", "timestamp", "external_timestamp"]
-        for df_name, df in [
-            ("messages", self.messages_df),
-            ("statuses", self.statuses_df),
-        ]:
+        date_columns = [
+            "inserted_at",
+            "updated_at",
+            "timestamp",
+            "external_timestamp",
+            "last_status_timestamp",
+        ]
+        for attr in ("messages_df", "statuses_df"):
+            df = getattr(self, attr)
             if not df.empty:
-                for col in date_columns:
-                    if col in df.columns:
-                        df[col] = pd.to_datetime(df[col], errors="coerce")
+                # Columns parsed at extraction are already datetimes; skip re-parsing them
+                converted = {
+                    col: pd.to_datetime(
+                        df[col], errors="coerce", format="ISO8601", utc=True, cache=True
+                    )
+                    for col in date_columns
+                    if col in df.columns
+                    and not pd.api.types.is_datetime64_any_dtype(df[col])
+                }
+                setattr(self, attr, df.assign(**converted))
 
         logger.info(
             f"Cleaned: {len(self.messages_df)} messages, {len(self.statuses_df)} statuses"
         )
 
+    @_copy_on_write
     def transform_unified_view(self) -> pd.DataFrame:
         """Transform statuses to wide format and join with messages.
 
@@ -115,10 +166,8 @@ class DataTransformer:
                 ]
             )
         else:
-            statuses = self.statuses_df.copy()
-            for col in ["timestamp", "inserted_at", "updated_at"]:
-                if col in statuses.columns:
-                    statuses[col] = pd.to_datetime(statuses[col], errors="coerce")
+            # Timestamps were converted in clean_data
+            statuses = self.statuses_df
 
             statuses_subset = statuses[
                 [
@@ -136,67 +185,71 @@ class DataTransformer:
                     ]
                     if c in statuses.columns
                 ]
-            ].copy()
+            ]
 
-            # Pivot counts for sent/delivered/read
+            # Status as a categorical of the pivoted types: filters and groupbys work
+            # on int8 codes, and any other status becomes missing
             pivot_statuses = ["sent", "delivered", "read", "failed", "deleted"]
+            statuses_subset = statuses_subset.assign(
+                status=pd.Categorical(statuses_subset["status"], categories=pivot_statuses)
+            )
+            statuses_subset = statuses_subset[
+                statuses_subset["status"].notna() & statuses_subset["message_uuid"].notna()
+            ]
+
+            # Pivot counts for sent/delivered/read
             counts_df = (
-                statuses_subset[statuses_subset["status"].isin(pivot_statuses)]
-                .groupby(["message_uuid", "status"])
+                statuses_subset.groupby(["message_uuid", "status"], observed=True)
                 .size()
                 .unstack(fill_value=0)
+                .reindex(columns=pivot_statuses, fill_value=0)
             )
-            for c in pivot_statuses:
-                if c not in counts_df.columns:
-                    counts_df[c] = 0
-            for c in pivot_statuses:
-                counts_df[c] = counts_df[c].astype("int64")
-            counts_df = counts_df.reset_index()
-
-            def get_latest_status(status_type: str, prefix: str) -> pd.DataFrame:
-                df = statuses_subset[statuses_subset["status"] == status_type].copy()
-                if df.empty:
-                    return pd.DataFrame(columns=["message_uuid", f"{prefix}_timestamp"])
-
-                # Get latest by timestamp
-                latest = df.sort_values("timestamp").groupby("message_uuid").last().reset_index()
-                latest = latest[["message_uuid", "timestamp", "uuid", "id"]].rename(
-                    columns={
-                        "timestamp": f"{prefix}_timestamp",
-                        "uuid": f"{prefix}_status_uuid",
-                        "id": f"{prefix}_status_id"
-                    }
-                )
-                return latest
-
-            sent_flat = get_latest_status("sent", "sent")
-            delivered_flat = get_latest_status("delivered", "delivered")
-            read_flat = get_latest_status("read", "read")
-            failed_flat = get_latest_status("failed", "failed")
-            deleted_flat = get_latest_status("deleted", "deleted")
-
+            # uint16 holds any realistic per-message count (uint8 could wrap at 256)
+            counts_df = counts_df.astype({c: "uint16" for c in pivot_statuses})
+
+            # Latest row per (message, status), computed once for all status types;
+            # missing timestamps sort first so they never win over real ones
+            latest_statuses = statuses_subset.sort_values(
+                ["message_uuid", "status", "timestamp"], na_position="first"
+            ).drop_duplicates(["message_uuid", "status"], keep="last")
+
+            # Spread the latest row of every status type into {status}_{field} columns
+            latest_fields = {
+                "timestamp": "timestamp",
+                "uuid": "status_uuid",
+                "id": "status_id",
+            }
+            latest_pivots = [
+                # Pivot one field at a time so each keeps its own dtype
+                latest_statuses.pivot(index="message_uuid", columns="status", values=field)
+                .reindex(columns=pivot_statuses)
+                .astype(_pivot_dtype(latest_statuses[field].dtype))
+                .add_suffix(f"_{suffix}")
+                for field, suffix in latest_fields.items()
+            ]
+
+            # Counts and pivots are all indexed by message_uuid, so one column-wise
+            # concat aligns them without a hash join
+            status_wide = pd.concat([counts_df, *latest_pivots], axis=1)
             status_wide = (
-                counts_df.merge(sent_flat, on="message_uuid", how="left")
-                .merge(delivered_flat, on="message_uuid", how="left")
-                .merge(read_flat, on="message_uuid", how="left")
-                .merge(failed_flat, on="message_uuid", how="left")
-                .merge(deleted_flat, on="message_uuid", how="left")
+                status_wide[
+                    pivot_statuses
+                    + [
+                        f"{status}_{suffix}"
+                        for status in pivot_statuses
+                        for suffix in latest_fields.values()
+                    ]
+                ]
+                .rename_axis(index="message_uuid", columns=None)
+                .reset_index()
             )
 
-            for c in pivot_statuses:
-                if c in status_wide.columns:
-                    status_wide[c] = status_wide[c].fillna(0).astype("int64")
+            status_wide[pivot_statuses] = (
+                status_wide[pivot_statuses].fillna(0).astype("uint16")
+            )
 
         # Prepare message data
-        msg = self.messages_df.copy()
-        for col in [
-            "inserted_at",
-            "updated_at",
-            "external_timestamp",
-            "last_status_timestamp",
-        ]:
-            if col in msg.columns:
-                msg[col] = pd.to_datetime(msg[col], errors="coerce")
+        msg = self.messages_df
 
         rename_map = {
             "id": "message_id",
@@ -241,7 +294,7 @@ class DataTransformer:
             )
         else:
             # No status data, add empty columns
-            unified = msg_base.copy()
+            unified = msg_base
             for col in [
                 "sent",
                 "delivered",
@@ -290,34 +343,44 @@ class DataTransformer:
                     else None
                 )
 
-        # Save status table for later use
-        self.status_flat = status_wide.copy()
-
         logger.info(
             f"Created unified view with {len(unified)} records and {len(unified.columns)} columns"
         )
         return unified
 
-    def detect_duplicates(self) -> List[DuplicateRecord]:
-        """Find duplicate messages based on identical content"""
-        logger.info("Detecting duplicates...")
-
-        duplicates = []
+    def detect_duplicates(self, dataset: Optional[str] = None) -> pd.DataFrame:
+        """Find duplicate messages based on identical content
 
-        # Find messages with identical content
-        if not self.messages_df.empty:
-            content_groups = self.messages_df.groupby("content")
+        With a dataset, the duplicates table built by the SQL transforms is
+        downloaded; otherwise messages are compared in pandas.
+        Returns a DataFrame with DuplicateRecord's columns; use
+        DuplicateRecord.from_pandas_dataframe only if model objects are needed.
+        """
+        logger.info("Detecting duplicates...")
 
-            for content, group in content_groups:
-                if len(group) > 1 and content and str(content).strip():
-                    # Create duplicate records
-                    for _, row in group.iterrows():
-                        try:
-                            duplicate = DuplicateRecord.from_pandas_row(row)
-                            duplicates.append(duplicate)
-                        except Exception as e:
-                            logger.warning(f"Failed to create duplicate record: {e}")
-                            continue
+        columns = list(DuplicateRecord.model_fields)
+
+        if dataset:
+            if read_table_as_arrow is None:
+                raise ImportError("google-cloud-bigquery is not installed")
+            # ArrowDtype keeps nullable integers as integers
+            duplicates = (
+                read_table_as_arrow("duplicates", dataset)
+                .to_pandas(types_mapper=pd.ArrowDtype)
+                .sort_values(["content", "id"], ignore_index=True)
+                .reindex(columns=columns)
+            )
+        # Find messages with identical, non-blank content
+        elif not self.messages_df.empty:
+            content = self.messages_df["content"]
+            not_blank = content.astype("string").str.strip().fillna("").ne("")
+            mask = not_blank & content.duplicated(keep=False)
+            duplicates = strip_string_columns(self.messages_df.loc[mask])
+            duplicates = duplicates.reindex(columns=columns)
+        else:
+            duplicates = pd.DataFrame(columns=columns)
+        # Not a source column; keep it a text column rather than all-NaN floats
+        duplicates = duplicates.astype({"duplicate_group": "string"})
 
         logger.info(f"Found {len(duplicates)} potential duplicate records")
         return duplicates
@@ -332,14 +395,21 @@ class DataTransformer:
 
         # Messages without required fields
         if not self.messages_df.empty and all(col in self.messages_df.columns for col in ["id", "uuid", "inserted_at"]):
-            missing_required = self.messages_df[["id", "uuid", "inserted_at"]].isnull().any(axis=1).sum()
+            missing_required = int(
+                self.messages_df[["id", "uuid", "inserted_at"]]
+                .isna()
+                .to_numpy()
+                .any(axis=1)
+                .sum()
+            )
         else:
             missing_required = 0
 
         # Invalid status values
         valid_statuses = ["sent", "delivered", "read", "failed", "deleted"]
         if not self.statuses_df.empty and "status" in self.statuses_df.columns:
-            invalid_statuses = len(self.statuses_df[~self.statuses_df["status"].isin(valid_statuses)])
+            # Count the mask directly instead of materializing the invalid rows
+            invalid_statuses = int((~self.statuses_df["status"].isin(valid_statuses)).sum())
         else:
             invalid_statuses = 0
 
@@ -389,24 +459,60 @@ class DataTransformer:
         logger.info("Data quality checks completed")
         return report
 
-    def transform_all(self) -> Dict[str, Any]:
-        """Run all transformations using SQL-style approach"""
+    def run(
+        self, dataset: Optional[str] = None, read_back: bool = False
+    ) -> Optional[pd.DataFrame]:
+        """Build the unified view inside BigQuery
+
+        Expects messages_raw and statuses_raw to be loaded into the dataset already.
+        The table stays in BigQuery unless read_back is set, which downloads it
+        as a DataFrame.
+        """
+        if run_sql_transforms is None:
+            raise ImportError("google-cloud-bigquery is not installed")
+
+        dataset = dataset or os.getenv("BIGQUERY_DATASET", "whatsapp_healthcare")
+        run_sql_transforms(dataset)
+        if not read_back:
+            return None
+        return read_table_as_arrow("unified_messages", dataset).to_pandas(
+            types_mapper=pd.ArrowDtype
+        )
+
+    def transform_all(
+        self,
+        dataset: Optional[str] = None,
+        in_memory: bool = False,
+        read_back: bool = False,
+    ) -> Dict[str, Any]:
+        """Run all transformations using SQL-style approach
+
+        The unified view is pushed down to BigQuery unless in_memory is set, which
+        builds it with pandas instead (local runs without BigQuery). In BigQuery
+        the unified_messages and duplicates tables stay in the dataset, and their
+        results are None unless read_back is set.
+        """
         logger.info("Running transformation pipeline...")
 
         # Clean data
         self.clean_data()
 
-        # Create unified message view
-        unified_messages = self.transform_unified_view()
-
-        # Find duplicate messages
-        duplicates = self.detect_duplicates()
+        # Create unified message view and find duplicate messages
+        if in_memory:
+            unified_messages = self.transform_unified_view()
+            duplicates = self.detect_duplicates()
+            duplicates_found = len(duplicates)
+        else:
+            dataset = dataset or os.getenv("BIGQUERY_DATASET", "whatsapp_healthcare")
+            unified_messages = self.run(dataset, read_back=read_back)
+            duplicates = self.detect_duplicates(dataset) if read_back else None
+            duplicates_found = count_table_rows("duplicates", dataset)
 
         # Run quality checks
         quality_report = self.data_quality_checks()
 
         # Update duplicates count in quality report
-        quality_report.duplicates_found = len(duplicates)
+        quality_report.duplicates_found = duplicates_found
 
         results = {
             "unified_messages": unified_messages,